@@ -1,6 +1,7 @@
 import os
 import cv2 as cv
 import shutil
+import subprocess
 import time
 from xml.dom.minidom import parseString
 
@@ -87,6 +88,67 @@ class UserInfo(object):
     def __repr__(self):
         return str(self.info)
 
+# 常驻adb shell会话: 每次操作只走一次管道往返,省掉fork+exec+adb握手的开销
+class DnSession(object):
+    def __init__(self, index: int):
+        self.index = index
+        # 雷电模拟器的adb序列号规则: emulator-5554, emulator-5556, ...
+        self.serial = 'emulator-%d' % (5554 + 2 * index)
+        self._shell = None
+
+    def _ensure_shell(self):
+        if self._shell is None or self._shell.poll() is not None:
+            self._shell = subprocess.Popen(
+                ['adb', '-s', self.serial, 'shell'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, bufsize=0)
+        return self._shell
+
+    def shell(self, command: str) -> str:
+        # 命令后面跟一个哨兵行,读到哨兵即认为本条命令执行完毕
+        shell = self._ensure_shell()
+        shell.stdin.write((command + '; echo __done__\n').encode())
+        shell.stdin.flush()
+        lines = []
+        while True:
+            line = shell.stdout.readline()
+            if not line:
+                self._shell = None
+                raise RuntimeError('adb shell会话已断开')
+            text = line.decode('utf-8', 'replace').strip()
+            if text.endswith('__done__'):
+                break
+            lines.append(text)
+        return '\n'.join(lines)
+
+    def touch(self, x: int, y: int, delay: int = 0):
+        if delay == 0:
+            self.shell('input tap %d %d' % (x, y))
+        else:
+            self.shell('input touch %d %d %d' % (x, y, delay))
+
+    def swipe(self, coordinate_leftup: tuple, coordinate_rightdown: tuple, delay: int = 0):
+        x0, y0 = coordinate_leftup
+        x1, y1 = coordinate_rightdown
+        if delay == 0:
+            self.shell('input swipe %d %d %d %d' % (x0, y0, x1, y1))
+        else:
+            self.shell('input swipe %d %d %d %d %d' % (x0, y0, x1, y1, delay))
+
+    def batch(self, commands: list) -> str:
+        # 多条命令合成一行一次下发,N次管道往返变1次
+        return self.shell('; '.join(commands))
+
+    def close(self):
+        if self._shell is not None:
+            try:
+                self._shell.stdin.close()
+                self._shell.terminate()
+            except OSError:
+                pass
+            self._shell = None
+
+
 class Dnconsole:
     # 请根据自己电脑配置
     console = 'D:\\leidian\\LDPlayer9\\dnconsole.exe '
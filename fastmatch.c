@@ -0,0 +1,175 @@
+/*
+ * fastmatch: screencap原始RGBA帧 -> 灰度 -> 批量模板NCC,一遍内存走完
+ *
+ * 对整帧只做一次灰度转换,每个模板只在自己的ROI里做CCORR_NORMED,
+ * 内层点积循环交给GCC自动向量化(编译参数见setup.py: -O3 -mavx2 -ffast-math)。
+ *
+ * 编译: python setup.py build_ext --inplace
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <math.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+/*
+ * 在gray的[x1,y1,x2,y2)区域内滑动模板,返回最高的CCORR_NORMED分数和位置。
+ * 窗口的平方和分母从预先算好的积分图sat2读出(O(1)每窗口),
+ * 内层只剩点积循环,交给编译器自动向量化。
+ */
+static double
+ncc_roi(const uint8_t *gray, const double *sat2, int w, int h,
+        const uint8_t *tmpl, int tw, int th,
+        int x1, int y1, int x2, int y2,
+        int *best_x, int *best_y)
+{
+    double tnorm2 = 0.0;
+    int i, j, x, y;
+    double best = -1.0;
+    int stride = w + 1;
+
+    for (i = 0; i < tw * th; i++)
+        tnorm2 += (double)tmpl[i] * (double)tmpl[i];
+    double tnorm = sqrt(tnorm2);
+
+    if (x1 < 0) x1 = 0;
+    if (y1 < 0) y1 = 0;
+    if (x2 > w) x2 = w;
+    if (y2 > h) y2 = h;
+
+    for (y = y1; y <= y2 - th; y++) {
+        for (x = x1; x <= x2 - tw; x++) {
+            int64_t dot = 0;
+            for (i = 0; i < th; i++) {
+                const uint8_t *row = gray + (size_t)(y + i) * w + x;
+                const uint8_t *trow = tmpl + (size_t)i * tw;
+                for (j = 0; j < tw; j++)
+                    dot += (int64_t)row[j] * trow[j];
+            }
+            double inorm2 = sat2[(size_t)(y + th) * stride + x + tw]
+                          - sat2[(size_t)y * stride + x + tw]
+                          - sat2[(size_t)(y + th) * stride + x]
+                          + sat2[(size_t)y * stride + x];
+            double score = (double)dot / (sqrt(inorm2) * tnorm + 1e-9);
+            if (score > best) {
+                best = score;
+                *best_x = x;
+                *best_y = y;
+            }
+        }
+    }
+    return best;
+}
+
+/*
+ * match_batch(rgba: bytes, w: int, h: int, templates: list) -> (index, cx, cy) | None
+ *
+ * templates的每项为 (gray_bytes, tw, th, x1, y1, x2, y2, threshold),
+ * 按顺序评估,返回第一个达到阈值的模板下标和中心坐标。
+ */
+static PyObject *
+match_batch(PyObject *self, PyObject *args)
+{
+    Py_buffer rgba;
+    int w, h;
+    PyObject *tmpls;
+
+    if (!PyArg_ParseTuple(args, "y*iiO!", &rgba, &w, &h, &PyList_Type, &tmpls))
+        return NULL;
+    if (rgba.len < (Py_ssize_t)w * h * 4) {
+        PyBuffer_Release(&rgba);
+        PyErr_SetString(PyExc_ValueError, "RGBA buffer smaller than w*h*4");
+        return NULL;
+    }
+
+    uint8_t *gray = (uint8_t *)malloc((size_t)w * h);
+    if (gray == NULL) {
+        PyBuffer_Release(&rgba);
+        return PyErr_NoMemory();
+    }
+
+    /* 整帧只扫一遍: BT.601定点灰度 (77r+150g+29b)>>8,和cv2解码模板的权重一致 */
+    {
+        const uint8_t *src = (const uint8_t *)rgba.buf;
+        size_t n = (size_t)w * h;
+        size_t i;
+        for (i = 0; i < n; i++)
+            gray[i] = (uint8_t)((77 * src[i * 4] + 150 * src[i * 4 + 1]
+                                 + 29 * src[i * 4 + 2] + 128) >> 8);
+    }
+
+    /* 平方和积分图,供每个窗口O(1)取分母 */
+    double *sat2 = (double *)calloc((size_t)(w + 1) * (h + 1), sizeof(double));
+    if (sat2 == NULL) {
+        free(gray);
+        PyBuffer_Release(&rgba);
+        return PyErr_NoMemory();
+    }
+    {
+        int x, y;
+        for (y = 0; y < h; y++) {
+            double row_sum2 = 0.0;
+            for (x = 0; x < w; x++) {
+                double v = (double)gray[(size_t)y * w + x];
+                row_sum2 += v * v;
+                sat2[(size_t)(y + 1) * (w + 1) + x + 1] =
+                    sat2[(size_t)y * (w + 1) + x + 1] + row_sum2;
+            }
+        }
+    }
+
+    PyObject *hit = NULL;
+    Py_ssize_t count = PyList_Size(tmpls);
+    Py_ssize_t idx;
+    for (idx = 0; idx < count && hit == NULL; idx++) {
+        Py_buffer tbuf;
+        int tw, th, x1, y1, x2, y2;
+        double threshold;
+        if (!PyArg_ParseTuple(PyList_GetItem(tmpls, idx), "y*iiiiiid",
+                              &tbuf, &tw, &th, &x1, &y1, &x2, &y2, &threshold)) {
+            free(sat2);
+            free(gray);
+            PyBuffer_Release(&rgba);
+            return NULL;
+        }
+        if (tbuf.len < (Py_ssize_t)tw * th) {
+            PyBuffer_Release(&tbuf);
+            free(sat2);
+            free(gray);
+            PyBuffer_Release(&rgba);
+            PyErr_SetString(PyExc_ValueError, "template buffer smaller than tw*th");
+            return NULL;
+        }
+        int bx = 0, by = 0;
+        double score = ncc_roi(gray, sat2, w, h, (const uint8_t *)tbuf.buf,
+                               tw, th, x1, y1, x2, y2, &bx, &by);
+        PyBuffer_Release(&tbuf);
+        if (score >= threshold)
+            hit = Py_BuildValue("(nii)", idx, bx + tw / 2, by + th / 2);
+    }
+
+    free(sat2);
+    free(gray);
+    PyBuffer_Release(&rgba);
+    if (hit != NULL)
+        return hit;
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef fastmatch_methods[] = {
+    {"match_batch", match_batch, METH_VARARGS,
+     "match_batch(rgba, w, h, templates) -> (index, cx, cy) | None"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef fastmatch_module = {
+    PyModuleDef_HEAD_INIT, "fastmatch",
+    "Fused grayscale conversion + batched template NCC over a raw RGBA frame.",
+    -1, fastmatch_methods
+};
+
+PyMODINIT_FUNC
+PyInit_fastmatch(void)
+{
+    return PyModule_Create(&fastmatch_module);
+}
@@ -0,0 +1,13 @@
+import logging
+
+# 日志只在这里配置一次: main.py和mokuai_fz.py都引入本模块,
+# 避免各自调用basicConfig重复注册FileHandler导致每条日志写两遍
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("jianghu_auto.log"),
+            logging.StreamHandler()
+        ]
+    )
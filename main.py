@@ -2,52 +2,321 @@ import os
 import time
 import cv2
 import numpy as np
+import json
+import struct
+import subprocess
 import logging
+from concurrent.futures import ThreadPoolExecutor, CancelledError, as_completed
+from dataclasses import dataclass
 from typing import Tuple, Optional, List, Dict
 
 # 引入底层模拟器控制
-from Moni_Leidian import Dnconsole
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("jianghu_auto.log"),
-        logging.StreamHandler()
-    ]
-)
+from Moni_Leidian import Dnconsole, DnSession
+
+# 配置日志(集中在log_setup,避免重复注册handler)
+import log_setup
 logger = logging.getLogger("JiangHuAuto")
 
+# 可选的C扩展: 原始RGBA帧一遍过完成灰度转换+批量NCC
+# 编译: python setup.py build_ext --inplace
+try:
+    import fastmatch
+except ImportError:
+    fastmatch = None
+
+# Numba是可选依赖: 有则为极小模板启用JIT核,没有则全部走OpenCV
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = prange = None
+    _ncc_search = None
+
+if njit is not None:
+    @njit('f4[:,:](u1[:,:], u1[:,:])', parallel=True, fastmath=True, cache=True)
+    def _ncc_search(image, template):
+        # 归一化互相关(语义同TM_CCOEFF_NORMED),积分图流式算窗口均值/方差
+        th, tw = template.shape
+        oh = image.shape[0] - th + 1
+        ow = image.shape[1] - tw + 1
+        n = th * tw
+        # 模板统计量只算一次
+        tsum = 0.0
+        for i in range(th):
+            for j in range(tw):
+                tsum += template[i, j]
+        tmean = tsum / n
+        tnorm2 = 0.0
+        for i in range(th):
+            for j in range(tw):
+                d = template[i, j] - tmean
+                tnorm2 += d * d
+        tnorm = np.sqrt(tnorm2)
+        # 图像的和/平方和积分图
+        h, w = image.shape
+        sat = np.zeros((h + 1, w + 1), np.float64)
+        sat2 = np.zeros((h + 1, w + 1), np.float64)
+        for i in range(h):
+            row_sum = 0.0
+            row_sum2 = 0.0
+            for j in range(w):
+                v = np.float64(image[i, j])
+                row_sum += v
+                row_sum2 += v * v
+                sat[i + 1, j + 1] = sat[i, j + 1] + row_sum
+                sat2[i + 1, j + 1] = sat2[i, j + 1] + row_sum2
+        out = np.empty((oh, ow), np.float32)
+        for y in prange(oh):
+            for x in range(ow):
+                psum = sat[y + th, x + tw] - sat[y, x + tw] - sat[y + th, x] + sat[y, x]
+                psum2 = sat2[y + th, x + tw] - sat2[y, x + tw] - sat2[y + th, x] + sat2[y, x]
+                # sum(T-Tmean)=0,所以交叉项只需减模板均值
+                cross = 0.0
+                for i in range(th):
+                    for j in range(tw):
+                        cross += np.float64(image[y + i, x + j]) * (template[i, j] - tmean)
+                inorm2 = psum2 - psum * psum / n
+                out[y, x] = np.float32(cross / (np.sqrt(inorm2) * tnorm + 1e-9))
+        return out
+
+# 跨实例共享的解码缓存,键带mtime/size,模板文件变了自动失效
+# (多开时每个JiangHuAuto实例不再各自解码一遍同一批模板)
+_TEMPLATE_CACHE: Dict[tuple, np.ndarray] = {}
+
+
+@dataclass
+class Template:
+    # 模板加载后不可变,归一化常量在加载时一次算好,匹配时不再重复扫模板
+    gray: np.ndarray
+    mean: float
+    norm: float
+    zero_mean_f32: np.ndarray
+    roi: Optional[Tuple[int, int, int, int]] = None
+    small: Optional[np.ndarray] = None
+    method: int = cv2.TM_CCORR_NORMED
+    ahash: int = 0  # 64位均值哈希,用于整屏状态分类
+
+
 class JiangHuAuto:
-    def __init__(self, emulator_index: int = 0, template_dir: str = "templates"):
+    def __init__(self, emulator_index: int = 0, template_dir: str = "templates", num_workers: int = 1):
         self.emulator_index = emulator_index
+        # 多开时按worker数均分OpenCV线程,避免各实例的线程池互相挤占
+        cv2.setNumThreads(max(1, (os.cpu_count() or 1) // max(1, num_workers)))
         self.template_dir = template_dir
         self.screenshot_path = os.path.join(Dnconsole.share_path, "apk_scr.png")
+        # 雷电模拟器的adb序列号规则: emulator-5554, emulator-5556, ...
+        self.adb_serial = "emulator-%d" % (5554 + 2 * emulator_index)
+        self._adb_ok = True  # adb直连失败后回退到共享目录方式
+        self._raw_ok = True  # 原始帧格式不支持时记下来,后续帧直接走PNG
+        self._session = DnSession(emulator_index)
+        self._session_ok = True  # 会话失败后回退到逐条下发
+        self._screen_gray: Optional[np.ndarray] = None  # 最近一次截图的灰度缓存
+        self._last_raw: Optional[Tuple[bytes, int, int]] = None  # 原始RGBA帧,供fastmatch用
+        self._screen_small: Optional[np.ndarray] = None  # 半分辨率缓存,按帧惰性生成
+        self._prev_gray: Optional[np.ndarray] = None  # 上一帧灰度,用于画面变化检测
+        self.thresholds: Dict[str, float] = {}  # 可选的单模板阈值覆盖
+        self._result_bufs: Dict[str, np.ndarray] = {}  # matchTemplate输出缓冲,按模板复用
+        # matchTemplate内部会释放GIL,多模板匹配可以真并行
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count())
         self.templates = self._load_templates()
         logger.info(f"初始化自动化脚本，模拟器索引: {emulator_index}")
 
-    def _load_templates(self) -> Dict[str, np.ndarray]:
+    def _load_templates(self) -> Dict[str, Template]:
         templates = {}
         if not os.path.exists(self.template_dir):
             os.makedirs(self.template_dir)
             logger.warning(f"模板目录 {self.template_dir} 不存在，已创建空目录")
             return templates
-        for filename in os.listdir(self.template_dir):
-            if filename.endswith(('.png', '.jpg', '.jpeg')):
-                name = os.path.splitext(filename)[0]
-                template_path = os.path.join(self.template_dir, filename)
-                templates[name] = cv2.imread(template_path, 0)
+        # scandir一次拿到目录项和stat,比listdir+exists少一轮系统调用
+        for entry in os.scandir(self.template_dir):
+            if entry.name.endswith(('.png', '.jpg', '.jpeg')):
+                name = os.path.splitext(entry.name)[0]
+                st = entry.stat()
+                cache_key = (entry.path, st.st_mtime_ns, st.st_size)
+                gray = _TEMPLATE_CACHE.get(cache_key)
+                if gray is None:
+                    gray = self._load_template_gray(entry.path)
+                    if gray is None:
+                        logger.warning(f"模板 '{name}' 读取失败,已跳过")
+                        continue
+                    _TEMPLATE_CACHE[cache_key] = gray
+                # 太小的模板降采样后细节不足,不做金字塔匹配
+                small = cv2.pyrDown(gray) if min(gray.shape) >= 32 else None
+                roi, method = self._load_meta(name)
+                if roi is not None:
+                    roi = self._validate_roi(name, roi, gray.shape)
+                mean = float(gray.mean())
+                zero_mean = gray.astype(np.float32) - mean
+                norm = float(np.linalg.norm(zero_mean))
+                templates[name] = Template(gray, mean, norm, zero_mean, roi, small, method,
+                                           self._ahash(gray))
                 logger.debug(f"加载模板: {name}")
         logger.info(f"已加载 {len(templates)} 个模板图片")
         return templates
 
+    @staticmethod
+    def _load_template_gray(template_path: str) -> Optional[np.ndarray]:
+        # 首次解码后缓存为.npy,之后的启动直接内存映射原始字节,跳过PNG解码
+        npy_path = os.path.splitext(template_path)[0] + '.npy'
+        if os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(template_path):
+            try:
+                return np.load(npy_path, mmap_mode='r')
+            except (ValueError, OSError):
+                pass  # 缓存损坏,重新解码
+        gray = cv2.imread(template_path, 0)
+        if gray is not None:
+            try:
+                np.save(npy_path, gray)
+            except OSError as e:
+                logger.warning(f"写入模板缓存失败: {str(e)}")
+        return gray
+
+    # CCORR_NORMED对近二值的UI图标判别力和CCOEFF相当,但少一次减均值,SIMD路径更快
+    _METHODS = {
+        'ccoeff': cv2.TM_CCOEFF_NORMED,
+        'ccorr': cv2.TM_CCORR_NORMED,
+        'sqdiff': cv2.TM_SQDIFF_NORMED,
+    }
+
+    def _load_meta(self, name: str):
+        # 可选的JSON边车文件 <name>.json:
+        # {"roi":[x1,y1,x2,y2], "method":"ccoeff"|"ccorr"|"sqdiff"}
+        roi = None
+        method = cv2.TM_CCORR_NORMED
+        json_path = os.path.join(self.template_dir, name + '.json')
+        if not os.path.exists(json_path):
+            return roi, method
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            raw_roi = meta.get('roi')
+            if raw_roi and len(raw_roi) == 4:
+                roi = tuple(int(v) for v in raw_roi)
+            method = self._METHODS.get(meta.get('method', 'ccorr'), method)
+        except (ValueError, OSError) as e:
+            logger.warning(f"模板 '{name}' 的边车文件解析失败: {str(e)}")
+        return roi, method
+
+    @staticmethod
+    def _ahash(img: np.ndarray) -> int:
+        # 8×8均值哈希: 缩放->按均值二值化->打包成64位整数
+        small = cv2.resize(img, (8, 8), interpolation=cv2.INTER_AREA)
+        value = 0
+        for bit in (small > small.mean()).flat:
+            value = (value << 1) | int(bit)
+        return value
+
+    def classify_screen(self, candidates: List[str], max_distance: int = 5) -> Optional[str]:
+        """整屏状态分类: 截图算一次哈希,候选逐个比汉明距离,代替K次滑窗匹配"""
+        if self._screen_gray is None:
+            logger.error("没有可用的截图缓存,请先调用 take_screenshot")
+            return None
+        screen_hash = self._ahash(self._screen_gray)
+        best_name = None
+        best_dist = max_distance + 1
+        for name in candidates:
+            if name not in self.templates:
+                logger.error(f"模板 '{name}' 未找到")
+                continue
+            dist = bin(screen_hash ^ self.templates[name].ahash).count('1')
+            if dist < best_dist:
+                best_name, best_dist = name, dist
+        if best_name:
+            logger.debug("整屏分类命中 '%s',汉明距离: %d", best_name, best_dist)
+        return best_name
+
+    @staticmethod
+    def _validate_roi(name: str, roi: Tuple[int, int, int, int],
+                      tmpl_shape: tuple) -> Optional[Tuple[int, int, int, int]]:
+        # 不合法的ROI会让matchTemplate直接抛异常,加载时就挡掉,处理方式同坏JSON
+        x1, y1, x2, y2 = roi
+        if x1 < 0 or y1 < 0 or x2 <= x1 or y2 <= y1:
+            logger.warning(f"模板 '{name}' 的ROI {roi} 不合法,已忽略")
+            return None
+        if (y2 - y1) < tmpl_shape[0] or (x2 - x1) < tmpl_shape[1]:
+            logger.warning(f"模板 '{name}' 的ROI {roi} 小于模板尺寸,已忽略")
+            return None
+        return roi
+
+    @staticmethod
+    def _ncc_single(roi: np.ndarray, tmpl: Template) -> float:
+        # 唯一对齐位置上按模板声明的method打分,和滑窗路径的阈值语义保持一致
+        # (CCOEFF的零均值向量和范数已在加载时算好,这里只处理截图侧)
+        a = roi.astype(np.float32).ravel()
+        if tmpl.method == cv2.TM_CCOEFF_NORMED:
+            a -= a.mean()
+            return float(a @ tmpl.zero_mean_f32.ravel() / (np.linalg.norm(a) * tmpl.norm + 1e-9))
+        b = np.asarray(tmpl.gray, dtype=np.float32).ravel()
+        denom = np.linalg.norm(a) * np.linalg.norm(b) + 1e-9
+        if tmpl.method == cv2.TM_SQDIFF_NORMED:
+            d = a - b
+            return float(1.0 - d @ d / denom)
+        return float(a @ b / denom)  # TM_CCORR_NORMED
+
+    def _decode_raw_screencap(self, buf: bytes) -> Optional[np.ndarray]:
+        # screencap不带-p时输出原始帧: 宽,高,格式各4字节小端(Android 13+头部多4字节colorSpace)
+        if len(buf) < 16:
+            return None
+        w, h, fmt = struct.unpack('<III', buf[:12])
+        if fmt != 1:  # 只支持RGBA_8888
+            return None
+        for offset in (12, 16):
+            if len(buf) - offset == w * h * 4:
+                img = np.frombuffer(buf, np.uint8, count=w * h * 4, offset=offset).reshape(h, w, 4)
+                # 原始帧留一份给C扩展,整帧灰度+批量匹配可以一遍过
+                self._last_raw = (buf[offset:], w, h)
+                return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+        return None
+
     def take_screenshot(self) -> bool:
+        self._last_raw = None
         try:
-            # 用Dnconsole截屏
+            # 优先走adb标准输出直接取原始帧(不带-p,跳过PNG编解码),免去模拟器写盘+主机读盘+等待
+            if self._adb_ok:
+                try:
+                    gray = None
+                    if self._raw_ok:
+                        result = subprocess.run(
+                            ['adb', '-s', self.adb_serial, 'exec-out', 'screencap'],
+                            capture_output=True)
+                        if result.returncode == 0 and result.stdout:
+                            gray = self._decode_raw_screencap(result.stdout)
+                        if gray is None:
+                            # 原始帧解析不了(格式不支持等),记下来,别让每帧都白抓一次
+                            self._raw_ok = False
+                            logger.info("原始帧格式不支持,后续截屏改走PNG")
+                    if gray is None:
+                        result = subprocess.run(
+                            ['adb', '-s', self.adb_serial, 'exec-out', 'screencap', '-p'],
+                            capture_output=True)
+                        if result.returncode == 0 and result.stdout:
+                            data = np.frombuffer(result.stdout, dtype=np.uint8)
+                            gray = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+                    if gray is not None:
+                        self._screen_gray = gray
+                        self._screen_small = None
+                        logger.debug("截屏成功")
+                        return True
+                except OSError:
+                    pass
+                logger.warning("adb直连截屏失败,回退到共享目录方式")
+                self._adb_ok = False
+            # 回退路径: 用Dnconsole截屏到共享目录再读回
+            before = os.path.getmtime(self.screenshot_path) if os.path.exists(self.screenshot_path) else 0
             Dnconsole.dnld(self.emulator_index, 'screencap -p /sdcard/Pictures/apk_scr.png')
-            time.sleep(1)
+            # 固定睡1秒改成轮询文件落盘,通常几十毫秒就绪
+            deadline = time.time() + 2.0
+            while time.time() < deadline:
+                if os.path.exists(self.screenshot_path) and os.path.getmtime(self.screenshot_path) > before:
+                    break
+                time.sleep(0.05)
             if os.path.exists(self.screenshot_path):
+                # 只解码一次PNG,之后的模板匹配都用这份灰度缓存
+                data = np.fromfile(self.screenshot_path, dtype=np.uint8)
+                self._screen_gray = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+                if self._screen_gray is None:
+                    logger.error("截图解码失败")
+                    return False
+                self._screen_small = None
                 logger.debug("截屏成功")
                 return True
             else:
@@ -57,37 +326,236 @@ class JiangHuAuto:
             logger.error(f"截屏异常: {str(e)}")
             return False
 
-    def find_template(self, template_name: str, threshold: float = 0.8) -> Optional[Tuple[int, int]]:
+    def _result_buf(self, name: str, scr_shape: tuple, tmpl_shape: tuple) -> np.ndarray:
+        # 复用matchTemplate的输出数组,免得每帧都分配/释放一块MB级float32
+        shape = (scr_shape[0] - tmpl_shape[0] + 1, scr_shape[1] - tmpl_shape[1] + 1)
+        buf = self._result_bufs.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, np.float32)
+            self._result_bufs[name] = buf
+        return buf
+
+    @staticmethod
+    def _best_match(result: np.ndarray, method: int) -> Tuple[float, Tuple[int, int]]:
+        # SQDIFF越小越好,其余方法越大越好;统一成"分数越大越好"
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        if method == cv2.TM_SQDIFF_NORMED:
+            return 1.0 - min_val, min_loc
+        return max_val, max_loc
+
+    def find_template(self, template_name: str, threshold: float = 0.95) -> Optional[Tuple[int, int]]:
         if template_name not in self.templates:
             logger.error(f"模板 '{template_name}' 未找到")
             return None
-        screenshot = cv2.imread(self.screenshot_path, 0)
+        screenshot = self._screen_gray
         if screenshot is None:
-            logger.error("无法读取截图文件")
+            logger.error("没有可用的截图缓存,请先调用 take_screenshot")
             return None
-        template = self.templates[template_name]
-        result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        tmpl = self.templates[template_name]
+        template, roi, tmpl_small, method = tmpl.gray, tmpl.roi, tmpl.small, tmpl.method
+        off_x, off_y = 0, 0
+        if roi is not None:
+            # 只在声明的区域内搜索,matchTemplate开销随面积线性下降
+            # (屏幕尺寸到这一刻才知道,超界就截到屏幕边缘)
+            x1, y1, x2, y2 = roi
+            x2 = min(x2, screenshot.shape[1])
+            y2 = min(y2, screenshot.shape[0])
+            if (y2 - y1) >= template.shape[0] and (x2 - x1) >= template.shape[1]:
+                screenshot = screenshot[y1:y2, x1:x2]
+                off_x, off_y = x1, y1
+            else:
+                logger.warning("模板 '%s' 的ROI超出屏幕范围,本帧改为全屏搜索", template_name)
+        if screenshot.shape == template.shape:
+            h, w = template.shape
+            # 模拟器渲染是确定性的,先试逐字节比较(memcmp级速度,遇到差异立即短路)
+            if np.array_equal(screenshot, template):
+                center_x, center_y = off_x + w // 2, off_y + h // 2
+                logger.debug("找到模板 '%s'(逐字节相等), 位置: (%d, %d)", template_name, center_x, center_y)
+                return (center_x, center_y)
+            # 截图经过有损压缩时退一步,用平均绝对差做廉价容差判断
+            if float(np.mean(cv2.absdiff(np.asarray(screenshot), np.asarray(template)))) < 2.0:
+                center_x, center_y = off_x + w // 2, off_y + h // 2
+                logger.debug("找到模板 '%s'(近似相等), 位置: (%d, %d)", template_name, center_x, center_y)
+                return (center_x, center_y)
+            # 模板和搜索区域同尺寸时只有一个对齐位置,两次点积即可,不用滑窗matchTemplate
+            ncc = self._ncc_single(screenshot, tmpl)
+            if ncc >= threshold:
+                center_x, center_y = off_x + w // 2, off_y + h // 2
+                logger.debug("找到模板 '%s'(快速路径)，置信度: %.2f, 位置: (%d, %d)", template_name, ncc, center_x, center_y)
+                return (center_x, center_y)
+            logger.debug("未找到模板 '%s'(快速路径)，置信度: %.2f", template_name, ncc)
+            return None
+        if tmpl_small is not None:
+            # 粗到细金字塔: 先在半分辨率上找候选,再在全分辨率小窗口内精化
+            if roi is None:
+                if self._screen_small is None:
+                    self._screen_small = cv2.pyrDown(self._screen_gray)
+                scr_small = self._screen_small
+            else:
+                scr_small = cv2.pyrDown(screenshot)
+            if scr_small.shape[0] >= tmpl_small.shape[0] and scr_small.shape[1] >= tmpl_small.shape[1]:
+                result = cv2.matchTemplate(scr_small, tmpl_small, method,
+                                           self._result_buf(template_name + '#small',
+                                                            scr_small.shape, tmpl_small.shape))
+                coarse_val, coarse_loc = self._best_match(result, method)
+                # 粗筛阈值放宽一点,避免降采样损失误杀真实命中
+                if coarse_val < threshold - 0.15:
+                    logger.debug("未找到模板 '%s'(粗筛),最高置信度: %.2f", template_name, coarse_val)
+                    return None
+                th, tw = template.shape
+                wx = max(0, coarse_loc[0] * 2 - 4)
+                wy = max(0, coarse_loc[1] * 2 - 4)
+                screenshot = screenshot[wy:wy + th + 8, wx:wx + tw + 8]
+                off_x += wx
+                off_y += wy
+        if _ncc_search is not None and method == cv2.TM_CCOEFF_NORMED and template.size <= 256:
+            # 极小模板(<16×16)时OpenCV的单次调用开销占大头,改走Numba核
+            # (核的语义是CCOEFF_NORMED,所以只替换声明了ccoeff的模板)
+            result = _ncc_search(np.ascontiguousarray(screenshot), np.ascontiguousarray(template))
+            max_val, max_loc = self._best_match(result, method)
+        else:
+            result = cv2.matchTemplate(screenshot, template, method,
+                                       self._result_buf(template_name, screenshot.shape, template.shape))
+            max_val, max_loc = self._best_match(result, method)
         if max_val >= threshold:
             h, w = template.shape
-            x, y = max_loc
+            x, y = max_loc[0] + off_x, max_loc[1] + off_y
             center_x = x + w // 2
             center_y = y + h // 2
-            logger.debug(f"找到模板 '{template_name}'，置信度: {max_val:.2f}, 位置: ({center_x}, {center_y})")
+            logger.debug("找到模板 '%s'，置信度: %.2f, 位置: (%d, %d)", template_name, max_val, center_x, center_y)
             return (center_x, center_y)
         else:
-            logger.debug(f"未找到模板 '{template_name}'，最高置信度: {max_val:.2f}")
+            logger.debug("未找到模板 '%s'，最高置信度: %.2f", template_name, max_val)
+            return None
+
+    def find_templates(self, template_names: List[str], threshold: float = 0.95) -> Dict[str, Tuple[int, int]]:
+        # 在同一帧缓存上批量查找多个模板,解码开销只花一次
+        found = {}
+        for name in template_names:
+            position = self.find_template(name, threshold)
+            if position:
+                found[name] = position
+        return found
+
+    # C路径是朴素滑窗,单个模板允许的乘加次数上限;
+    # 超过的(典型是无ROI的全帧搜索)走OpenCV的DFT实现反而快几个量级
+    _NATIVE_BUDGET = 5_000_000
+
+    def find_any(self, template_names: List[str], threshold: float = 0.95) -> Optional[Tuple[str, int, int]]:
+        # 一次截屏匹配多个候选模板,省掉N-1次截屏和解码
+        if not self.take_screenshot():
             return None
+        if fastmatch is not None and self._last_raw is not None:
+            # C扩展只接搜索量有限的候选(小ROI或和整帧同尺寸),其余交给OpenCV
+            native, rest = self._split_native(template_names)
+            if native:
+                hit = self._match_any_native(native, threshold)
+                if hit:
+                    return hit
+            if rest:
+                return self._match_any(rest, threshold)
+            return None
+        return self._match_any(template_names, threshold)
+
+    def _split_native(self, template_names: List[str]) -> Tuple[List[str], List[str]]:
+        _, w, h = self._last_raw
+        native, rest = [], []
+        for name in template_names:
+            tmpl = self.templates.get(name)
+            if tmpl is None:
+                rest.append(name)  # find_template那边会报"模板未找到"
+                continue
+            if tmpl.method != cv2.TM_CCORR_NORMED:
+                # C路径只实现CCORR_NORMED,声明了其他method的模板
+                # 不能拿CCORR分数去比它们各自语义的阈值
+                rest.append(name)
+                continue
+            th_, tw_ = tmpl.gray.shape
+            if tmpl.roi is not None:
+                x1, y1, x2, y2 = tmpl.roi
+                positions = max(0, min(x2, w) - x1 - tw_ + 1) * max(0, min(y2, h) - y1 - th_ + 1)
+            elif (th_, tw_) == (h, w):
+                positions = 1  # 整帧等尺寸比较,只有一个对齐位置
+            else:
+                positions = None  # 无ROI的全帧滑窗,C路径吃不消
+            if positions is not None and positions * tw_ * th_ <= self._NATIVE_BUDGET:
+                native.append(name)
+            else:
+                rest.append(name)
+        return native, rest
+
+    def _match_any_native(self, template_names: List[str], threshold: float) -> Optional[Tuple[str, int, int]]:
+        buf, w, h = self._last_raw
+        names = []
+        descs = []
+        for name in template_names:
+            tmpl = self.templates.get(name)
+            if tmpl is None:
+                logger.error(f"模板 '{name}' 未找到")
+                continue
+            x1, y1, x2, y2 = tmpl.roi if tmpl.roi is not None else (0, 0, w, h)
+            gray = np.ascontiguousarray(tmpl.gray)
+            descs.append((gray.tobytes(), gray.shape[1], gray.shape[0], x1, y1, x2, y2,
+                          self.thresholds.get(name, threshold)))
+            names.append(name)
+        if not descs:
+            return None
+        hit = fastmatch.match_batch(buf, w, h, descs)
+        if hit is None:
+            return None
+        index, center_x, center_y = hit
+        logger.debug("找到模板 '%s'(C扩展), 位置: (%d, %d)", names[index], center_x, center_y)
+        return (names[index], center_x, center_y)
+
+    def _match_any(self, template_names: List[str], threshold: float) -> Optional[Tuple[str, int, int]]:
+        # 在当前帧缓存上匹配,不重新截屏;多候选时每个模板一个线程
+        if len(template_names) <= 1:
+            for name in template_names:
+                position = self.find_template(name, self.thresholds.get(name, threshold))
+                if position:
+                    x, y = position
+                    return (name, x, y)
+            return None
+        # 半分辨率缓存先算好,免得多个线程各自pyrDown一遍
+        if self._screen_small is None and self._screen_gray is not None and \
+                any(n in self.templates and self.templates[n].small is not None for n in template_names):
+            self._screen_small = cv2.pyrDown(self._screen_gray)
+        futures = {
+            self._pool.submit(self.find_template, name, self.thresholds.get(name, threshold)): name
+            for name in template_names
+        }
+        hit = None
+        for future in as_completed(futures):
+            try:
+                position = future.result()
+            except CancelledError:
+                continue
+            if position and hit is None:
+                x, y = position
+                hit = (futures[future], x, y)
+                # 已命中,还没开始跑的任务直接取消
+                for other in futures:
+                    other.cancel()
+        return hit
+
+    def _screen_changed(self, eps: float = 0.01) -> bool:
+        # 和上一帧做平均绝对差,判断画面是否有变化
+        # 截图是无损的,静止画面差值严格为0;阈值必须远小于1,
+        # 否则一个小按钮的出现(720p全帧均值只动~0.3)会被当成"没变化"
+        prev, self._prev_gray = self._prev_gray, self._screen_gray
+        if prev is None or self._screen_gray is None or prev.shape != self._screen_gray.shape:
+            return True
+        return float(np.mean(cv2.absdiff(self._screen_gray, prev))) > eps
 
     def click(self, x: int, y: int, delay: float = 0.5):
         try:
             Dnconsole.touch(self.emulator_index, x, y)
-            logger.debug(f"点击位置: ({x}, {y})")
+            logger.debug("点击位置: (%d, %d)", x, y)
             time.sleep(delay)
         except Exception as e:
             logger.error(f"点击操作异常: {str(e)}")
 
-    def click_template(self, template_name: str, threshold: float = 0.8) -> bool:
+    def click_template(self, template_name: str, threshold: float = 0.95) -> bool:
         if not self.take_screenshot():
             return False
         position = self.find_template(template_name, threshold)
@@ -97,38 +565,117 @@ class JiangHuAuto:
             return True
         return False
 
+    def batch(self, ops: List[str]):
+        # 把多条shell命令(如'input tap 100 200'、'sleep 2')合成一次往返下发
+        if self._session_ok:
+            try:
+                self._session.batch(ops)
+                logger.debug("批量下发 %d 条命令", len(ops))
+                return
+            except (OSError, RuntimeError):
+                logger.warning("adb会话不可用,回退到逐条下发")
+                self._session_ok = False
+        for op in ops:
+            Dnconsole.dnld(self.emulator_index, op)
+
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300, delay: float = 1.0):
         try:
             Dnconsole.swipe(self.emulator_index, (x1, y1), (x2, y2), duration)
-            logger.debug(f"滑动: ({x1}, {y1}) -> ({x2}, {y2})")
+            logger.debug("滑动: (%d, %d) -> (%d, %d)", x1, y1, x2, y2)
             time.sleep(delay)
         except Exception as e:
             logger.error(f"滑动操作异常: {str(e)}")
 
-    def wait_for_template(self, template_name: str, timeout: int = 30, interval: float = 1.0, threshold: float = 0.8) -> bool:
+    def wait_for_template(self, template_name, timeout: int = 30, interval: float = 1.0, threshold: float = 0.95) -> bool:
+        # template_name 可以是单个名称,也可以是候选名称列表(同一帧上批量匹配)
+        names = [template_name] if isinstance(template_name, str) else list(template_name)
         start_time = time.time()
+        wait = 0.1
+        first = True
         while time.time() - start_time < timeout:
             if self.take_screenshot():
-                position = self.find_template(template_name, threshold)
-                if position:
-                    logger.info(f"找到模板 '{template_name}'")
-                    return True
-            time.sleep(interval)
+                # 首轮必须匹配一次: _prev_gray跨调用保留,上一个等待可能已锁存当前画面
+                if self._screen_changed() or first:
+                    first = False
+                    # 画面变了,立即匹配并把轮询间隔收紧
+                    wait = 0.1
+                    if all(n in self.templates and
+                           self.templates[n].gray.shape == self._screen_gray.shape for n in names):
+                        # 候选全是整屏模板,用感知哈希分类代替滑窗匹配
+                        hit_name = self.classify_screen(names)
+                        if hit_name:
+                            logger.info(f"找到模板 '{hit_name}'")
+                            return True
+                    else:
+                        hit = self._match_any(names, threshold)
+                        if hit:
+                            logger.info(f"找到模板 '{hit[0]}'")
+                            return True
+                else:
+                    # 画面没变,匹配结果也不会变,逐步放慢轮询
+                    wait = min(wait * 1.5, interval)
+            time.sleep(wait)
         logger.warning(f"等待模板 '{template_name}' 超时")
         return False
 
+    def wait_for_any(self, template_names: List[str], timeout: int = 30, interval: float = 1.0,
+                     threshold: float = 0.95) -> Optional[Tuple[str, int, int]]:
+        """等待任一候选模板出现,返回(名称, x, y);轮询间隔随画面变化自适应"""
+        start_time = time.time()
+        wait = 0.1
+        first = True
+        while time.time() - start_time < timeout:
+            if self.take_screenshot():
+                # 首轮必须匹配一次,理由同wait_for_template
+                if self._screen_changed() or first:
+                    first = False
+                    wait = 0.1
+                    hit = self._match_any(template_names, threshold)
+                    if hit:
+                        logger.info(f"找到模板 '{hit[0]}'")
+                        return hit
+                else:
+                    wait = min(wait * 1.5, interval)
+            time.sleep(wait)
+        logger.warning(f"等待模板 {template_names} 超时")
+        return None
+
+    def wait_screen_stable(self, timeout: float = 5.0, stable_frames: int = 2, poll: float = 0.1) -> bool:
+        """等待画面连续若干帧无变化,用于目标模板未知的过渡动画"""
+        start_time = time.time()
+        still = 0
+        while time.time() - start_time < timeout:
+            if self.take_screenshot():
+                if self._screen_changed():
+                    still = 0
+                else:
+                    still += 1
+                    if still >= stable_frames:
+                        return True
+            time.sleep(poll)
+        return False
+
     def run_daily_tasks(self):
         logger.info("开始执行日常任务")
         if self.click_template("task_button"):
             logger.info("已点击任务按钮")
-            time.sleep(2)
-            if self.wait_for_template("task_interface", timeout=10):
-                if self.click_template("daily_task"):
-                    logger.info("已选择日常任务")
-                    time.sleep(2)
-                    if self.click_template("claim_reward"):
-                        logger.info("已领取任务奖励")
-                        time.sleep(2)
+            # 不再固定睡2秒,按0.1秒起步的自适应轮询等界面出现
+            if self.wait_for_template("task_interface", timeout=10, interval=0.5):
+                # 日常任务和领奖按钮可能同屏出现,在同一帧上批量匹配
+                # 循环设上限: 点击无效、按钮一直在屏上时不能无人值守地转圈
+                for _ in range(5):
+                    hit = self.find_any(["daily_task", "claim_reward"])
+                    if not hit:
+                        break
+                    name, x, y = hit
+                    self.batch([f'input tap {x} {y}'])
+                    logger.info(f"已点击 '{name}'")
+                    # 等画面稳定而不是固定等2秒
+                    self.wait_screen_stable(timeout=3)
+                    if name == "claim_reward":
+                        break
+                else:
+                    logger.warning("日常任务点击次数达到上限,跳出")
         self.click(50, 50)
         logger.info("日常任务执行完成")
 
@@ -169,7 +716,8 @@ if __name__ == "__main__":
     else:
         logger.warning("未识别到开始游戏按钮")
 
-    time.sleep(30)
+    # 不再固定等30秒,江湖按钮一出现就点
+    auto.wait_for_template('jianghu', timeout=60, interval=1.0)
     if auto.click_template('jianghu'):
         logger.info("已点击江湖")
     else:
@@ -6,15 +6,11 @@ import subprocess
 import logging
 from typing import Tuple, Optional, List, Dict
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("jianghu_auto.log"),
-        logging.StreamHandler()
-    ]
-)
+# 常驻adb会话,点击/滑动不再每次拉起dnconsole.exe
+from Moni_Leidian import Dnconsole, DnSession
+
+# 配置日志(集中在log_setup,避免重复注册handler)
+import log_setup
 logger = logging.getLogger("JiangHuAuto")
 
 
@@ -30,6 +26,8 @@ class JiangHuAuto:
         self.emulator_index = emulator_index
         self.template_dir = template_dir
         self.screenshot_path = "screenshot.png"
+        self._session = DnSession(emulator_index)
+        self._session_ok = True  # 会话失败后回退到dnconsole.exe
 
         # 预加载模板图片
         self.templates = self._load_templates()
@@ -109,10 +107,10 @@ class JiangHuAuto:
             x, y = max_loc
             center_x = x + w // 2
             center_y = y + h // 2
-            logger.debug(f"找到模板 '{template_name}'，置信度: {max_val:.2f}, 位置: ({center_x}, {center_y})")
+            logger.debug("找到模板 '%s'，置信度: %.2f, 位置: (%d, %d)", template_name, max_val, center_x, center_y)
             return (center_x, center_y)
         else:
-            logger.debug(f"未找到模板 '{template_name}'，最高置信度: {max_val:.2f}")
+            logger.debug("未找到模板 '%s'，最高置信度: %.2f", template_name, max_val)
             return None
 
     def click(self, x: int, y: int, delay: float = 0.5):
@@ -125,9 +123,18 @@ class JiangHuAuto:
             delay: 点击后的延迟时间（秒）
         """
         try:
+            if self._session_ok:
+                try:
+                    self._session.touch(x, y)
+                    logger.debug("点击位置: (%d, %d)", x, y)
+                    time.sleep(delay)
+                    return
+                except (OSError, RuntimeError):
+                    logger.warning("adb会话不可用,回退到dnconsole.exe")
+                    self._session_ok = False
             cmd = f"dnconsole.exe action --index {self.emulator_index} --key call.touch --value {x},{y}"
             subprocess.run(cmd, shell=True, capture_output=True)
-            logger.debug(f"点击位置: ({x}, {y})")
+            logger.debug("点击位置: (%d, %d)", x, y)
             time.sleep(delay)
         except Exception as e:
             logger.error(f"点击操作异常: {str(e)}")
@@ -153,6 +160,25 @@ class JiangHuAuto:
             return True
         return False
 
+    def batch(self, ops: List[str]):
+        """
+        把多条shell命令(如'input tap 100 200'、'sleep 2')合成一次往返下发
+
+        Args:
+            ops: shell命令列表
+        """
+        if self._session_ok:
+            try:
+                self._session.batch(ops)
+                logger.debug("批量下发 %d 条命令", len(ops))
+                return
+            except (OSError, RuntimeError):
+                logger.warning("adb会话不可用,回退到逐条下发")
+                self._session_ok = False
+        # 会话连不上时adb本身多半也不可用,回退走dnconsole通道
+        for op in ops:
+            Dnconsole.dnld(self.emulator_index, op)
+
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300, delay: float = 1.0):
         """
         滑动操作
@@ -164,9 +190,18 @@ class JiangHuAuto:
             delay: 滑动后的延迟时间（秒）
         """
         try:
+            if self._session_ok:
+                try:
+                    self._session.swipe((x1, y1), (x2, y2), duration)
+                    logger.debug("滑动: (%d, %d) -> (%d, %d)", x1, y1, x2, y2)
+                    time.sleep(delay)
+                    return
+                except (OSError, RuntimeError):
+                    logger.warning("adb会话不可用,回退到dnconsole.exe")
+                    self._session_ok = False
             cmd = f"dnconsole.exe action --index {self.emulator_index} --key call.swipe --value {x1},{y1},{x2},{y2},{duration}"
             subprocess.run(cmd, shell=True, capture_output=True)
-            logger.debug(f"滑动: ({x1}, {y1}) -> ({x2}, {y2})")
+            logger.debug("滑动: (%d, %d) -> (%d, %d)", x1, y1, x2, y2)
             time.sleep(delay)
         except Exception as e:
             logger.error(f"滑动操作异常: {str(e)}")
@@ -0,0 +1,14 @@
+from setuptools import setup, Extension
+
+# 可选的C加速扩展,编译: python setup.py build_ext --inplace
+# 内层循环依赖GCC自动向量化,所以放开AVX2和fast-math
+setup(
+    name='fastmatch',
+    ext_modules=[
+        Extension(
+            'fastmatch',
+            sources=['fastmatch.c'],
+            extra_compile_args=['-O3', '-mavx2', '-ffast-math'],
+        )
+    ],
+)